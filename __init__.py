@@ -1,21 +1,41 @@
 import sys
 import importlib
+import importlib.util
 import subprocess
 import logging
-from .downloader import install_with_lock  # Import the new function with lock
+from .downloader import install_with_lock, _STDLIB_NAMES, _OWN_DEPENDENCIES  # Import the new function with lock
+
+# Names the hook has already looked at, so each module is probed only once
+_checked = set()
+
+# Local package names that should never be installed from PyPI; add your own project's packages here
+skip_modules = set()
 
 # Automatically trigger the library download process when the module is imported
 class LibraryImportHook:
+    _is_library_downloader_hook = True  # Lets downloader skip this finder when probing
+
     def find_spec(self, name, path, target=None):
         """Triggered whenever a module is imported"""
-        # Check if the module is already installed, otherwise try installing it
+        # Submodules (the parent was already handled), private modules and the standard library are never installed
+        if '.' in name or name.startswith('_') or name in _STDLIB_NAMES:
+            return None
+        # The library's own lazily imported dependencies must fail loudly if they are missing
+        if name in _OWN_DEPENDENCIES:
+            return None
+        if name in _checked or name in sys.modules or name in skip_modules:
+            return None
+        _checked.add(name)
+
+        # Probe the other finders without executing the module; install it only if nothing can find it
         try:
-            importlib.import_module(name)
-        except ImportError:
-            # If the module is not installed, attempt to install it with a lock
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None:
             install_with_lock(name)  # Use the new function with lock
+        # Let the regular import machinery finish loading the module
         return None
 
 # Register the import hook globally
 sys.meta_path.insert(0, LibraryImportHook())
-
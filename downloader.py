@@ -2,37 +2,103 @@ import sys
 import os
 import subprocess
 import time
+import random
 import logging
-from filelock import FileLock
-from plyer import notification
-from tkinter import Tk, messagebox
-from packaging import version as packaging_version
 import sysconfig
 import importlib
 import importlib.util
+import importlib.machinery
 import re
+import ast
 import builtins
 import tempfile
+import threading
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Set up logging to a file
-logging.basicConfig(filename='library_installation.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Module logger; the log file is only opened once something is installed
+logger = logging.getLogger("library_downloader")
+_log_mu = threading.Lock()
+_log_configured = False
 
-imported_packages = set()  # To keep track of already imported packages
+# Set up logging to a file the first time it is needed
+def _ensure_log():
+    global _log_configured
+    if _log_configured:
+        return
+    with _log_mu:
+        if _log_configured:
+            return
+        handler = logging.FileHandler('library_installation.log')
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        _log_configured = True
+
+# (interpreter, package) pairs installed by this process, and the installs still running
+# mapped to an Event that is set when they finish; both guarded by _install_mu
+_install_mu = threading.Lock()
+_installed = set()
+_installing = {}
+
+# Third-party packages this module imports lazily; the import hook must never pip-install
+# them, so a missing one fails with a clear ImportError instead
+_OWN_DEPENDENCIES = frozenset({'filelock', 'plyer', 'packaging'})
+
+# pip errors that mean the package can never be installed, so retrying is pointless
+_PERMANENT_PIP_ERRORS = ("No matching distribution", "Could not find a version")
+
+# Only show GUI popups when someone is at the terminal to answer them
+_INTERACTIVE = sys.stdin is not None and sys.stdin.isatty() and not os.environ.get("LIBDL_NONINTERACTIVE")
+
+# Set of packages that need to be installed, so each one is queued only once
+packages_to_install = set()
+
+# Temporary directory for lock files; this works across platforms
+_TMPDIR = tempfile.gettempdir()
+
+# Matches version requirement comments such as "# Required: requests>=2.0"
+_REQ_RE = re.compile(r'#\s*Required:\s*([A-Za-z0-9_.\-]+)\s*([<>=!~]=|[<>])\s*(\S+)')
+
+# Version requirements of the queued packages, taken from the most recent script that
+# imported each one; only used when reinstall_libraries_in_virtualenv fills a virtual environment
+_reinstall_requirements = {}
 
 # Function to extract version requirements from comments
 def extract_version_from_comments(script_content):
-    version_pattern = re.compile(r'#\s*Required:\s*(\S+)([<>=!]+)(\S+)')
-    version_requirements = re.findall(version_pattern, script_content)
-    return {pkg: (op, ver) for pkg, op, ver in version_requirements}
+    return {pkg: (op, ver) for pkg, op, ver in _REQ_RE.findall(script_content)}
+
+# Turn a package name into a pip requirement, adding its "# Required:" version if there is one
+def _requirement(package_name, required_versions):
+    if package_name in required_versions:
+        operator, version = required_versions[package_name]
+        return f"{package_name}{operator}{version}"
+    return package_name
+
+# Function to collect the top-level names of all absolute imports in a script
+def find_imports(script_content):
+    names = set()
+    tree = ast.parse(script_content)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names.add(alias.name.split('.')[0])
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            # Relative imports (node.level > 0) point inside the script's own package
+            names.add(node.module.split('.')[0])
+    return names
 
 # Function to check for Python version compatibility with the package
+@functools.lru_cache(maxsize=None)
 def is_python_compatible(package_name, required_version=None):
+    from packaging import version as packaging_version
     python_version = packaging_version.parse(".".join(map(str, sys.version_info[:3])))  # Get Python version as a packaging.Version object
     if required_version:
         operator, required_version_str = required_version
         required_version = packaging_version.parse(required_version_str)
 
-        logging.info(f"Checking if Python version {python_version} is compatible with {package_name} version {required_version}")
+        logger.info(f"Checking if Python version {python_version} is compatible with {package_name} version {required_version}")
         if operator == '==':
             return python_version == required_version
         elif operator == '>=':
@@ -47,18 +113,60 @@ def is_python_compatible(package_name, required_version=None):
             return True  # Assume compatibility if no valid operator is found
     return True  # Assume compatibility if no version specified
 
+# Scan the standard library directories for module names (used before Python 3.10)
+def _scan_stdlib_once():
+    paths = sysconfig.get_paths()
+    directories = [
+        paths["stdlib"],
+        os.path.join(paths["platstdlib"], 'lib-dynload'),  # Extension modules on Unix-based systems
+        os.path.join(sys.base_prefix, 'DLLs'),  # Extension modules on Windows
+    ]
+    names = set()
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.listdir(directory):
+            for suffix in importlib.machinery.EXTENSION_SUFFIXES:
+                if entry.endswith(suffix):
+                    names.add(entry[:-len(suffix)])
+                    break
+            else:
+                name, ext = os.path.splitext(entry)
+                if ext == '.py' or os.path.isdir(os.path.join(directory, entry)):
+                    names.add(name)
+    return names
+
+# Names of all standard library modules, computed once at import time
+if hasattr(sys, 'stdlib_module_names'):  # Python 3.10+
+    _STDLIB_NAMES = frozenset(sys.stdlib_module_names) | frozenset(sys.builtin_module_names)
+else:
+    _STDLIB_NAMES = frozenset(_scan_stdlib_once()) | frozenset(sys.builtin_module_names)
+
 # Function to check if a package is a standard Python library
 def is_standard_library(package_name):
-    # Get standard library directories from sysconfig
-    standard_lib_dirs = sysconfig.get_paths()["stdlib"]
-    # Check if the package is within any of these directories
-    try:
-        importlib.import_module(package_name)
+    return package_name.split('.')[0] in _STDLIB_NAMES
+
+# Check whether a module can be imported by asking every sys.meta_path finder except the
+# package's own import hook, so the hook is not re-entered (and does not start pip) while
+# probing; other finders such as those for editable installs are still consulted
+def _is_importable(package_name):
+    if package_name in sys.modules or package_name in sys.builtin_module_names:
         return True
-    except ImportError:
-        return False
+    for finder in sys.meta_path:
+        if getattr(finder, '_is_library_downloader_hook', False):
+            continue
+        find_spec = getattr(finder, 'find_spec', None)
+        if find_spec is None:
+            continue
+        try:
+            if find_spec(package_name, None) is not None:
+                return True
+        except (ImportError, ValueError):
+            continue
+    return False
 
 # Cross-platform function to get the correct virtual environment activation script
+@functools.lru_cache(maxsize=None)
 def get_activate_script(venv_dir="venv"):
     if os.name == 'nt':  # Windows
         return os.path.join(venv_dir, 'Scripts', 'activate.bat')
@@ -66,52 +174,182 @@ def get_activate_script(venv_dir="venv"):
         return os.path.join(venv_dir, 'bin', 'activate')
 
 # Cross-platform temporary directory handling for lock file
+@functools.lru_cache(maxsize=None)
 def get_lock_file(package_name):
-    lock_dir = tempfile.gettempdir()  # This works across platforms
-    lock_path = os.path.join(lock_dir, f'{package_name}.lock')
+    safe_name = re.sub(r'[^A-Za-z0-9_.\-]', '_', package_name)  # Requirements like "numpy<2.0" are not valid file names everywhere
+    lock_path = os.path.join(_TMPDIR, f'{safe_name}.lock')
     return lock_path
 
-# Improved function to install packages with retry and detailed feedback using locking
-def install_with_lock(package_name, retries=3):
-    lock_path = get_lock_file(package_name)  # Get platform-independent lock path
-    lock = FileLock(lock_path)
-
-    with lock:  # Acquire lock
-        for attempt in range(retries):
-            try:
-                subprocess.check_call([sys.executable, "-m", "pip", "install", package_name])
-                print(f"{package_name} installed successfully.")
-                logging.info(f"Successfully installed {package_name}")
+# Cross-platform function to get the Python interpreter inside a virtual environment
+@functools.lru_cache(maxsize=None)
+def _venv_python(venv_dir):
+    if os.name == 'nt':  # Windows
+        return os.path.join(venv_dir, 'Scripts', 'python.exe')
+    else:  # Unix-based systems (Linux, macOS)
+        return os.path.join(venv_dir, 'bin', 'python')
+
+# Build a quiet, non-interactive pip install command line for the given interpreter
+def _pip_install_command(*packages, python=None, upgrade=False):
+    upgrade_flag = ["--upgrade"] if upgrade else []
+    return [python or sys.executable, "-m", "pip", "--disable-pip-version-check", "install", "--quiet", "--no-input", *upgrade_flag, *packages]
+
+# Install a single package with retry and detailed feedback
+def _install_one(package_name, retries=3, python=None, upgrade=False):
+    for attempt in range(retries):
+        try:
+            subprocess.run(_pip_install_command(package_name, python=python, upgrade=upgrade), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+            print(f"{package_name} installed successfully.")
+            logger.info(f"Successfully installed {package_name}")
+            return True
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Attempt {attempt + 1} failed for {package_name}. Error: {e}")
+            if e.stderr:
+                logger.error(f"pip output for {package_name}:\n{e.stderr.strip()}")
+            if e.returncode == 1:
+                print(f"Error: Failed to install {package_name}. Please check your network connection or pip version.")
+            elif e.returncode == 2:
+                print(f"Error: There seems to be an issue with pip. Try upgrading pip using: pip install --upgrade pip")
+            elif e.returncode == 3:
+                print(f"Error: There might be a conflict with dependencies. Try using a virtual environment to resolve issues.")
+            else:
+                print(f"Unknown error occurred while installing {package_name}. Please try again or check logs.")
+
+            # Retrying will not help if pip cannot find the package at all
+            if any(marker in (e.stderr or '') for marker in _PERMANENT_PIP_ERRORS):
+                logger.error(f"{package_name} cannot be installed from the package index, not retrying.")
+                print(f"{package_name} cannot be installed from the package index, not retrying.")
                 break
-            except subprocess.CalledProcessError as e:
-                logging.error(f"Attempt {attempt + 1} failed for {package_name}. Error: {e}")
-                if e.returncode == 1:
-                    print(f"Error: Failed to install {package_name}. Please check your network connection or pip version.")
-                elif e.returncode == 2:
-                    print(f"Error: There seems to be an issue with pip. Try upgrading pip using: pip install --upgrade pip")
-                elif e.returncode == 3:
-                    print(f"Error: There might be a conflict with dependencies. Try using a virtual environment to resolve issues.")
-                else:
-                    print(f"Unknown error occurred while installing {package_name}. Please try again or check logs.")
-            
-            time.sleep(2 ** attempt)  # Exponential backoff
-            if attempt == retries - 1:
-                logging.error(f"Failed to install {package_name} after {retries} attempts.")
-                print(f"Failed to install {package_name} after {retries} attempts.")
+        except OSError as e:
+            # The interpreter itself could not be started (e.g. a broken virtual environment)
+            logger.error(f"Could not run pip for {package_name}. Error: {e}")
+            print(f"Error: Could not run pip for {package_name}: {e}")
+            return False
+
+        if attempt == retries - 1:
+            logger.error(f"Failed to install {package_name} after {retries} attempts.")
+            print(f"Failed to install {package_name} after {retries} attempts.")
+        else:
+            # Exponential backoff with jitter so parallel installs do not retry in lockstep
+            time.sleep((2 ** attempt) * random.uniform(0.8, 1.2))
+    return False
+
+# Claim packages for installation; returns the ones this call must install and the
+# installs already running elsewhere in this process that it has to wait for
+def _claim(packages, python, upgrade=False):
+    owned, waiting = [], []
+    with _install_mu:
+        for package in packages:
+            key = (python, package)
+            if key in _installed and not upgrade:  # An upgrade always goes to pip
+                continue
+            if key in _installing:
+                waiting.append((key, _installing[key]))
+            else:
+                _installing[key] = threading.Event()
+                owned.append(package)
+    return owned, waiting
+
+# Mark claimed packages as finished and wake up anyone waiting on them
+def _release(packages, python, succeeded):
+    with _install_mu:
+        for package in packages:
+            key = (python, package)
+            if package in succeeded:
+                _installed.add(key)
+            _installing.pop(key).set()
+
+# Only take file locks when other processes may be installing at the same time
+def _file_locks(packages):
+    stack = contextlib.ExitStack()
+    if os.environ.get("LIBDL_MULTIPROC"):
+        from filelock import FileLock
+        for package in sorted(packages):  # Fixed order so two batches cannot deadlock
+            stack.enter_context(FileLock(get_lock_file(package)))  # Get platform-independent lock path
+    return stack
+
+# Improved function to install packages with retry and detailed feedback using locking
+def install_with_lock(package_name, retries=3, python=None, upgrade=False):
+    return not install_many([package_name], python=python, retries=retries, upgrade=upgrade)
+
+# Kept for code written against the older retry-only installer
+install_with_retry = install_with_lock
+
+# Install several packages with a single pip invocation so the resolver only runs once;
+# returns the packages that could not be installed
+def install_many(packages, python=None, retries=3, max_workers=4, upgrade=False):
+    _ensure_log()
+    python = python or sys.executable
+    # Skip packages this process has already installed into the same interpreter
+    owned, waiting = _claim(dict.fromkeys(packages), python, upgrade)
+
+    succeeded = set()
+    try:
+        with _file_locks(owned):  # Acquire lock
+            if len(owned) == 1:
+                # A single package (every import hook miss) needs neither a batch nor a thread pool
+                if _install_one(owned[0], retries, python, upgrade):
+                    succeeded.add(owned[0])
+            elif owned and _install_batch(owned, python, upgrade):
+                succeeded.update(owned)
+            elif owned:
+                # One bad name fails the whole batch, so fall back to installing one by one to find
+                # out which packages fail; installs are network-bound, so they can be fetched in parallel
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {executor.submit(_install_one, package, retries, python, upgrade): package for package in owned}
+                    for future in as_completed(futures):
+                        package = futures[future]
+                        try:
+                            if future.result():
+                                succeeded.add(package)
+                        except Exception as e:
+                            logger.error(f"Unexpected error while installing {package}: {e}")
+    finally:
+        # Failed packages are not marked installed, so a later call can try them again
+        _release(owned, python, succeeded)
+
+    failed = [package for package in owned if package not in succeeded]
+
+    # Report installs started by another caller only once they have finished
+    for key, event in waiting:
+        event.wait()
+        with _install_mu:
+            if key not in _installed:
+                failed.append(key[1])
+
+    return sorted(failed)
+
+# Run one pip command for all packages; returns whether it succeeded
+def _install_batch(packages, python, upgrade=False):
+    try:
+        subprocess.run(_pip_install_command(*packages, python=python, upgrade=upgrade), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+        print(f"Installed {', '.join(packages)} successfully.")
+        logger.info(f"Successfully installed {', '.join(packages)}")
+        return True
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Failed to install {', '.join(packages)}. Error: {e}")
+        if e.stderr:
+            logger.error(f"pip output for {', '.join(packages)}:\n{e.stderr.strip()}")
+        print(f"Error: Failed to install {', '.join(packages)}. Installing them one by one instead.")
+        return False
+    except OSError as e:
+        logger.error(f"Could not run pip for {', '.join(packages)}. Error: {e}")
+        print(f"Error: Could not run pip for {', '.join(packages)}: {e}")
+        return False
 
 # Function to create a virtual environment if not already in one, with dependencies
 def create_virtualenv(venv_dir="venv", install_deps=False, dependencies=None):
+    _ensure_log()
     if dependencies is None:
         dependencies = ['requests', 'flask']  # Default list of dependencies to install
     
     # Check if virtual environment already exists
     if not os.path.exists(venv_dir):
-        logging.info(f"Virtual environment not found. Creating one at {venv_dir}...")
+        logger.info(f"Virtual environment not found. Creating one at {venv_dir}...")
         # Create the virtual environment if it doesn't exist
         subprocess.check_call([sys.executable, "-m", "venv", venv_dir])
-        logging.info(f"Created virtual environment at {venv_dir}")
+        logger.info(f"Created virtual environment at {venv_dir}")
     else:
-        logging.info(f"Virtual environment already exists at {venv_dir}")
+        logger.info(f"Virtual environment already exists at {venv_dir}")
     
     # Get the activation script for the current platform
     activate_script = get_activate_script(venv_dir)
@@ -121,9 +359,9 @@ def create_virtualenv(venv_dir="venv", install_deps=False, dependencies=None):
         if not os.path.exists(activate_script):
             raise FileNotFoundError(f"Activation script not found: {activate_script}")
     except FileNotFoundError as e:
-        logging.error(e)
+        logger.error(e)
         show_popup("Error", f"Error: {str(e)}")
-        return
+        return False
     
     # Optionally install dependencies
     if install_deps:
@@ -131,16 +369,27 @@ def create_virtualenv(venv_dir="venv", install_deps=False, dependencies=None):
 
     # Show the activation instructions in a popup
     show_popup("Virtual Environment Setup", f"To activate the virtual environment, run:\n\n{activate_script}")
+    return True
 
 # Function to install dependencies in the virtual environment
-def install_dependencies(venv_dir, dependencies):
-    # Activate the virtual environment
-    activate_script = get_activate_script(venv_dir)
-    for dep in dependencies:
-        install_with_lock(dep)
+def install_dependencies(venv_dir, dependencies, max_workers=4):
+    _ensure_log()
+    # Use the virtual environment's own interpreter so packages land inside it
+    failed = install_many(dependencies, python=_venv_python(venv_dir), max_workers=max_workers)
+
+    # Record the packages that could not be installed
+    if failed:
+        with open('requirements_failed.txt', 'w') as f:
+            f.write("\n".join(failed) + "\n")
+        logger.error(f"Failed to install dependencies: {', '.join(failed)}")
+    return failed
 
 # Show popup notifications
 def show_popup(title, message):
+    if not _INTERACTIVE:
+        logger.warning(f"{title}: {message}")
+        return
+    from plyer import notification
     notification.notify(
         title=title,
         message=message,
@@ -149,34 +398,46 @@ def show_popup(title, message):
 
 # Function to check and install the required package
 def check_and_install_package(package_name, required_version=None, upgrade=False, use_venv=False):
+    _ensure_log()
     try:
         # Check if the package is a standard library
         if is_standard_library(package_name):
-            logging.info(f"{package_name} is a standard library, skipping installation.")
+            logger.info(f"{package_name} is a standard library, skipping installation.")
             print(f"{package_name} is a standard library, skipping installation.")
             return
 
+        # Skip pip when the package can already be imported, unless an upgrade was requested
+        if not upgrade and _is_importable(package_name):
+            logger.info(f"{package_name} is already installed, skipping installation.")
+            print(f"{package_name} is already installed, skipping installation.")
+            return
+
         # Check if we are already in a virtual environment
         if use_venv and sys.prefix == sys.base_prefix:
             # Not in a virtual environment, so create one
             create_virtualenv()
 
         # Attempt to install the package
-        install_with_lock(package_name)
+        install_with_lock(package_name, upgrade=upgrade)
 
     except subprocess.CalledProcessError:
-        logging.error(f"Error during installation of {package_name}: {e}")
+        logger.error(f"Error during installation of {package_name}: {e}")
         print(f"Error during installation of {package_name}: {e}")
         
         # After failed installation, ask if the user wants to use a virtual environment
         if sys.prefix == sys.base_prefix:  # Only ask if the user is not in a virtual environment
             show_virtualenv_prompt(package_name)
     except Exception as e:
-        logging.error(f"Unexpected error with {package_name}: {e}")
+        logger.error(f"Unexpected error with {package_name}: {e}")
         print(f"Unexpected error with {package_name}: {e}")
 
 # Function to show the virtual environment creation prompt (GUI)
 def show_virtualenv_prompt(package_name):
+    if not _INTERACTIVE:
+        logger.warning(f"Installation of {package_name} failed. Create a virtual environment and try again.")
+        return
+
+    from tkinter import Tk, messagebox
     # Create a Tkinter window to ask user for virtual environment creation
     root = Tk()
     root.withdraw()  # Hide the main window
@@ -185,43 +446,69 @@ def show_virtualenv_prompt(package_name):
     
     if user_response == 'yes':
         print(f"Creating a virtual environment and installing {package_name}...")
-        create_virtualenv()
-        reinstall_libraries_in_virtualenv()  # Reinstall all required libraries inside the virtual environment
+        reinstall_libraries_in_virtualenv()  # Creates the virtual environment and reinstalls all required libraries inside it
     else:
         print("You chose not to create a virtual environment. Please install manually.")
-        logging.info(f"User chose not to create a virtual environment for {package_name}.")
+        logger.info(f"User chose not to create a virtual environment for {package_name}.")
+
+# Packages that still have to be installed; when installing into the current interpreter,
+# importable packages are skipped unless they carry a version requirement so pip can
+# check the installed version
+def _pending_packages(packages, current_interpreter, required_versions):
+    pending = []
+    for package in sorted(packages):
+        if is_standard_library(package):
+            continue
+        if current_interpreter and package not in required_versions and _is_importable(package):
+            continue
+        pending.append(package)
+    return pending
 
 # Function to reinstall all libraries inside a virtual environment
 def reinstall_libraries_in_virtualenv():
-    # List of all libraries that need to be installed
-    for package in packages_to_install:
-        check_and_install_package(package, use_venv=True)
-
-# List to keep track of packages that need to be installed
-packages_to_install = []
-
-# Function to monitor imports and install missing libraries
-def monitor_imports(frame, event, arg):
-    if event == 'call' and frame.f_code.co_name == "exec":
-        # Get the code being executed
-        code = frame.f_globals.get('__code__')
-        if code:
-            for line in code.co_lines():
-                if 'import' in line:
-                    package_name = line.split()[1]  # Extract the package name from the import
-                    if package_name not in imported_packages:  # Avoid processing the same package multiple times
-                        print(f"Detected import statement for: {package_name}")
-                        # Trigger library installation
-                        check_and_install_package(package_name)
-                        imported_packages.add(package_name)  # Mark as processed
-
-    return None
-
-# Function to start the monitoring process
-def start_monitoring():
-    print("Library downloader is now active. Waiting for imports...")
-    sys.setprofile(monitor_imports)  # Set the import monitoring hook
-
-# Start monitoring imports
-start_monitoring()
+    python = None  # The current interpreter already belongs to a virtual environment
+    if sys.prefix == sys.base_prefix:
+        # Not in a virtual environment, so create one and install into it
+        if not create_virtualenv():
+            logger.error("Could not set up the virtual environment, skipping reinstallation.")
+            print("Could not set up the virtual environment, skipping reinstallation.")
+            return
+        python = _venv_python("venv")
+
+    # A fresh virtual environment needs every queued package; the current one only the missing ones
+    pending = _pending_packages(packages_to_install, python is None, _reinstall_requirements)
+    install_many([_requirement(package, _reinstall_requirements) for package in pending], python=python)
+
+# Function to scan a script for imports and install the missing libraries
+def start_library_download(script_path):
+    _ensure_log()
+    with open(script_path, 'r', encoding='utf-8') as f:
+        script_content = f.read()
+
+    try:
+        package_names = find_imports(script_content)
+    except SyntaxError as e:
+        logger.error(f"Could not parse {script_path}: {e}")
+        print(f"Could not parse {script_path}: {e}")
+        return
+
+    # "# Required:" comments of this script are passed on to pip as version specifiers
+    required_versions = extract_version_from_comments(script_content)
+    for package_name in sorted(package_names):
+        # Queue every non-standard library import, even ones this process already has, so
+        # reinstall_libraries_in_virtualenv can fill a fresh virtual environment from the set
+        if package_name not in _STDLIB_NAMES:
+            packages_to_install.add(package_name)
+            if package_name in required_versions:
+                _reinstall_requirements[package_name] = required_versions[package_name]
+            else:
+                _reinstall_requirements.pop(package_name, None)
+
+    # Only this script's imports are installed here; the queue as a whole is for the venv reinstall
+    pending = _pending_packages(package_names, True, required_versions)
+    failed = install_many([_requirement(p, required_versions) for p in pending])
 
+    # Ask about a virtual environment once for everything that failed in this run
+    if failed and sys.prefix == sys.base_prefix:
+        show_virtualenv_prompt(", ".join(failed))
+    return failed